@@ -1,9 +1,11 @@
 import io
 import json
 import logging
+import time
+import urllib.error
 from flask import Flask, request, jsonify
-from PIL import Image
-from predict import initialize, predict_image, predict_url
+from PIL import Image, UnidentifiedImageError
+from predict import initialize, predict_image, fetch_image
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 4 * 1024 * 1024
@@ -28,7 +30,13 @@ def predict_image_handler(project=None, publishedName=None):
         else:
             imageData = io.BytesIO(request.get_data())
 
-        img = Image.open(imageData)
+        try:
+            img = Image.open(imageData)
+            img.load()
+        except (UnidentifiedImageError, OSError) as e:
+            print('IMAGE DECODE ERROR:', str(e))
+            return jsonify({'error': f'Invalid image: {str(e)}'}), 400
+
         results = predict_image(img)
         return jsonify(results)
     except Exception as e:
@@ -56,9 +64,23 @@ def predict_url_handler(project=None, publishedName=None):
         if not image_url:
             return jsonify({'error': 'Missing url or Url field in request'}), 400
             
-        results = predict_url(image_url)
+        fetch_start = time.monotonic()
+        try:
+            img = fetch_image(image_url)
+        except (urllib.error.URLError, ValueError, OSError) as e:
+            # The user's URL is unreachable or does not point at an image;
+            # this is not a failure of the prediction service itself
+            print('IMAGE FETCH ERROR:', str(e))
+            return jsonify({'error': f'Could not load image from URL: {str(e)}'}), 422
+
+        fetch_time = time.monotonic() - fetch_start
+
+        results = predict_image(img)
         print(f'Prediction results: {len(results.get("predictions", []))} predictions')
-        return jsonify(results)
+        response = jsonify(results)
+        # Lets callers subtract the third-party download from their latency
+        response.headers['X-Fetch-Time'] = f'{fetch_time:.4f}'
+        return response
     except json.JSONDecodeError as e:
         print('JSON DECODE ERROR:', str(e))
         return jsonify({'error': 'Invalid JSON format'}), 400
@@ -1,5 +1,7 @@
 import datetime
+import io
 import logging
+import os
 import pathlib
 import urllib.request
 import numpy as np
@@ -11,14 +13,19 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 global_predictor = None
-MODEL_PATH = pathlib.Path('model.tflite')
-LABELS_PATH = pathlib.Path('labels.txt')
+# MODEL_PATH may point into a shared-memory mount (e.g. /dev/shm) so that every
+# worker maps the same physical pages.
+MODEL_PATH = pathlib.Path(os.getenv('MODEL_PATH', 'model.tflite'))
+LABELS_PATH = pathlib.Path(os.getenv('LABELS_PATH', 'labels.txt'))
 IS_BGR = True
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 10))
 
 
 class Predictor:
     def __init__(self, model_path, labels_path):
         logger.debug(f"Loading model from {model_path}")
+        # Loading by path lets TFLite mmap the flatbuffer read-only instead of
+        # copying it into the process heap, so workers share the page cache.
         self._interpreter = tflite.Interpreter(model_path=str(model_path))
         self._interpreter.allocate_tensors()
 
@@ -27,6 +34,8 @@ class Predictor:
         assert len(input_details) == 1
         assert len(output_details) == 1
         self._input_index = input_details[0]['index']
+        self._input_shape = input_details[0]['shape']
+        self._input_dtype = input_details[0]['dtype']
         self._output_index = output_details[0]['index']
 
         input_size = int(input_details[0]['shape'][1])
@@ -40,6 +49,12 @@ class Predictor:
     def labels(self):
         return self._labels
 
+    def warm_up(self):
+        # Weights are mapped lazily; one invoke pages them in so memory usage
+        # sampled afterwards reflects the real footprint
+        self._interpreter.set_tensor(self._input_index, np.zeros(self._input_shape, dtype=self._input_dtype))
+        self._interpreter.invoke()
+
     def predict(self, image: PIL.Image.Image):
         input_array = self._preprocessor.preprocess(image)
         input_array = input_array[np.newaxis, :, :, :]
@@ -104,9 +119,27 @@ class Preprocessor:
         return image.crop((left, top, right, bottom))
 
 
+def get_memory_usage():
+    usage = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'RssAnon', 'RssFile', 'RssShmem'):
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
 def initialize():
     global global_predictor
     global_predictor = Predictor(MODEL_PATH, LABELS_PATH)
+    global_predictor.warm_up()
+
+    usage = get_memory_usage()
+    if usage:
+        logger.info(f"Worker {os.getpid()} memory after model warm-up (kB): " + ', '.join(f"{k}={v}" for k, v in usage.items()))
 
 
 def predict_image(pil_image):
@@ -120,8 +153,14 @@ def predict_image(pil_image):
     return response
 
 
+def fetch_image(image_url):
+    logger.info(f"Fetching image from {image_url}")
+    with urllib.request.urlopen(image_url, timeout=FETCH_TIMEOUT) as f:
+        image = PIL.Image.open(io.BytesIO(f.read()))
+        image.load()
+        return image
+
+
 def predict_url(image_url):
     logger.info(f"Predicting image from {image_url}")
-    with urllib.request.urlopen(image_url) as f:
-        image = PIL.Image.open(f)
-        return predict_image(image)
+    return predict_image(fetch_image(image_url))
@@ -1,13 +1,17 @@
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import time
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping, Optional
 from werkzeug.datastructures import FileStorage
 from flask import Flask, render_template, request, jsonify
 import requests
-from requests.exceptions import RequestException, Timeout
+from requests.exceptions import ConnectionError as RequestsConnectionError, RequestException, Timeout
 from PIL import Image
 from io import BytesIO
 
-from config import Config, INGREDIENTS_TEMPLATE
+from config import Config, INGREDIENTS_TEMPLATE, LABEL_SYNONYMS
+from resilience import AdaptiveConcurrencyLimiter, CircuitBreaker, ServiceUnavailable
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,6 +32,74 @@ except ValueError as e:
 app.config['MAX_CONTENT_LENGTH'] = Config.MAX_FILE_SIZE
 CONFIDENCE_THRESHOLD = Config.CONFIDENCE_THRESHOLD
 
+vision_limiter = AdaptiveConcurrencyLimiter(
+    initial_limit=Config.VISION_INITIAL_CONCURRENCY,
+    min_limit=Config.VISION_MIN_CONCURRENCY,
+    max_limit=Config.VISION_MAX_CONCURRENCY,
+    latency_target=Config.VISION_LATENCY_TARGET,
+    max_queue=Config.VISION_MAX_QUEUE,
+    queue_timeout=Config.VISION_QUEUE_TIMEOUT
+)
+# Per-process state: with several gunicorn workers each one sheds and trips its
+# breaker independently, so an outage takes CIRCUIT_FAILURE_THRESHOLD failures
+# in every worker before all of them fail fast
+vision_breaker = CircuitBreaker(
+    failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=Config.CIRCUIT_RESET_TIMEOUT
+)
+
+def normalize_label(label: str) -> str:
+    return ' '.join(label.lower().replace('_', ' ').replace('-', ' ').split())
+
+def label_variants(label: str) -> List[str]:
+    label = normalize_label(label)
+    variants = [label, f"{label}s", f"{label}es"]
+    if len(label) > 1 and label.endswith('y') and label[-2] not in 'aeiou':
+        variants.append(f"{label[:-1]}ies")
+    return variants
+
+def compile_label_mapping() -> Mapping[str, Optional[str]]:
+    mapping = {}
+    for ingredient in INGREDIENTS_TEMPLATE:
+        for variant in label_variants(ingredient):
+            mapping.setdefault(variant, ingredient)
+    for synonym, ingredient in LABEL_SYNONYMS.items():
+        if ingredient not in INGREDIENTS_TEMPLATE:
+            logger.warning(f"Synonym '{synonym}' targets unknown ingredient '{ingredient}'")
+            continue
+        for variant in label_variants(synonym):
+            mapping.setdefault(variant, ingredient)
+    
+    # Register the raw spellings the model emits so the hot path is a single lookup
+    unmapped = []
+    try:
+        with open(Config.LABELS_PATH) as f:
+            labels = [line.strip() for line in f if line.strip()]
+    except OSError:
+        labels = []
+        logger.info(f"Labels file not found at {Config.LABELS_PATH}, skipping coverage report")
+    for label in labels:
+        ingredient = mapping.get(normalize_label(label))
+        mapping[label] = ingredient
+        if ingredient is None:
+            unmapped.append(label)
+    
+    if labels:
+        logger.info(f"Label mapping compiled: {len(labels) - len(unmapped)}/{len(labels)} model labels mapped")
+    if unmapped:
+        logger.warning(f"Unmapped model labels: {', '.join(unmapped)}")
+    return MappingProxyType(mapping)
+
+LABEL_TO_INGREDIENT = compile_label_mapping()
+
+def map_label(label: str) -> Optional[str]:
+    ingredient = LABEL_TO_INGREDIENT.get(label)
+    if ingredient is None and label not in LABEL_TO_INGREDIENT:
+        ingredient = LABEL_TO_INGREDIENT.get(normalize_label(label))
+        if ingredient is None:
+            logger.warning(f"Unmapped label from Custom Vision: {label}")
+    return ingredient
+
 def validate_image_file(file: FileStorage) -> Optional[str]:
     if not file or not file.filename:
         return "No file selected"
@@ -50,6 +122,62 @@ def validate_image_url(url: str) -> Optional[str]:
     
     return None
 
+def call_custom_vision(url: str, **kwargs) -> requests.Response:
+    if not vision_limiter.acquire():
+        logger.warning(f"Shedding request: {vision_limiter.in_flight} in flight, limit {vision_limiter.limit}")
+        raise ServiceUnavailable("Image analysis is overloaded", retry_after=1)
+    
+    generation = vision_breaker.allow_request()
+    if generation is None:
+        vision_limiter.cancel()
+        raise ServiceUnavailable("Image analysis is temporarily unavailable", retry_after=vision_breaker.retry_after())
+    
+    start = time.monotonic()
+    try:
+        response = requests.post(url, timeout=Config.CUSTOM_VISION_TIMEOUT, **kwargs)
+    except (Timeout, RequestsConnectionError) as e:
+        logger.error(f"Custom Vision unreachable: {e}")
+        record_backend_failure(generation, start)
+        raise ServiceUnavailable("Image analysis is unavailable", retry_after=vision_breaker.retry_after()) from e
+    except Exception:
+        vision_breaker.record_inconclusive(generation)
+        vision_limiter.cancel()
+        raise
+    
+    # custom-vision answers 4xx for bad uploads and unreachable user URLs;
+    # any 5xx is a server-side failure (gateway error, model crash)
+    if response.status_code >= 500:
+        logger.error(f"Custom Vision returned {response.status_code}")
+        record_backend_failure(generation, start)
+        raise ServiceUnavailable("Image analysis is unavailable", retry_after=vision_breaker.retry_after())
+    
+    if not response.ok:
+        vision_breaker.record_inconclusive(generation)
+        vision_limiter.cancel()
+        response.raise_for_status()
+    
+    # Wall time includes upload transfer and backend queueing; only the
+    # third-party download on /url is subtracted so slow image hosts do not
+    # shrink the limit for everyone
+    latency = time.monotonic() - start
+    latency -= parse_seconds_header(response.headers.get("X-Fetch-Time"), latency)
+    vision_breaker.record_success(generation)
+    vision_limiter.release(latency, True)
+    return response
+
+def parse_seconds_header(value: Optional[str], upper_bound: float) -> float:
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if not 0.0 <= seconds <= upper_bound:
+        return 0.0
+    return seconds
+
+def record_backend_failure(generation: int, start: float):
+    vision_breaker.record_failure(generation)
+    vision_limiter.release(time.monotonic() - start, False)
+
 def detect_ingredients_from_url(image_url: str) -> List[Dict[str, Any]]:
     headers = {
         "Prediction-Key": Config.CUSTOM_VISION_KEY,
@@ -59,7 +187,7 @@ def detect_ingredients_from_url(image_url: str) -> List[Dict[str, Any]]:
     
     try:
         logger.info(f"Analyzing image from URL: {image_url[:50]}...")
-        response = requests.post(Config.CUSTOM_VISION_URL, json=payload, headers=headers, timeout=30)
+        response = call_custom_vision(Config.CUSTOM_VISION_URL, json=payload, headers=headers)
         response.raise_for_status()
         
         result = response.json()
@@ -73,6 +201,8 @@ def detect_ingredients_from_url(image_url: str) -> List[Dict[str, Any]]:
         logger.info(f"Ingredients detected: {len(detected_ingredients)}")
         return detected_ingredients
         
+    except ServiceUnavailable:
+        raise
     except (Timeout, RequestException) as e:
         logger.error(f"Error calling Custom Vision: {e}")
         return []
@@ -100,7 +230,7 @@ def detect_ingredients_from_file(image_file: FileStorage) -> List[Dict[str, Any]
                    if "/url" in Config.CUSTOM_VISION_URL 
                    else f"{Config.CUSTOM_VISION_URL.rstrip('/')}/image")
         
-        response = requests.post(file_url, data=image_data, headers=headers, timeout=30)
+        response = call_custom_vision(file_url, data=image_data, headers=headers)
         response.raise_for_status()
         
         result = response.json()
@@ -114,6 +244,8 @@ def detect_ingredients_from_file(image_file: FileStorage) -> List[Dict[str, Any]
         logger.info(f"Ingredients detected: {len(detected_ingredients)}")
         return detected_ingredients
         
+    except ServiceUnavailable:
+        raise
     except (Timeout, RequestException) as e:
         logger.error(f"Error calling Custom Vision: {e}")
         return []
@@ -125,8 +257,8 @@ def create_ingredients_dict(detected_ingredients: List[Dict[str, Any]]) -> Dict[
     ingredients_dict = INGREDIENTS_TEMPLATE.copy()
     
     for ingredient in detected_ingredients:
-        ingredient_name = ingredient["name"].lower()
-        if ingredient_name in ingredients_dict:
+        ingredient_name = map_label(ingredient["name"])
+        if ingredient_name is not None:
             ingredients_dict[ingredient_name] = 1
     
     active_ingredients = sum(v for v in ingredients_dict.values() if isinstance(v, (int, float)))
@@ -317,6 +449,15 @@ def analyze():
             "recipes": recipe_predictions
         })
     
+    except ServiceUnavailable as e:
+        logger.warning(f"Image analysis unavailable: {e}")
+        response = jsonify({
+            "error": f"{e}. Please try again later or select your ingredients manually.",
+            "degraded": True,
+            "manual_url": "/manual"
+        })
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
     except Exception as e:
         logger.error(f"Error during image analysis: {e}")
         return jsonify({"error": "Internal server error"}), 500
@@ -377,6 +518,14 @@ def health():
             "confidence_threshold_percent": f"{CONFIDENCE_THRESHOLD*100:.0f}%",
             "custom_vision_configured": bool(Config.CUSTOM_VISION_URL and Config.CUSTOM_VISION_KEY),
             "recipe_system": "local",
+            # The limiter and breaker live in each gunicorn worker process, so
+            # these describe only the worker that served this request
+            "custom_vision_worker": {
+                "pid": os.getpid(),
+                "circuit": vision_breaker.state,
+                "concurrency_limit": vision_limiter.limit,
+                "in_flight": vision_limiter.in_flight
+            },
             "max_file_size_mb": Config.MAX_FILE_SIZE // (1024*1024),
             "allowed_extensions": list(Config.ALLOWED_EXTENSIONS)
         })
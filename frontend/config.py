@@ -11,10 +11,25 @@ class Config:
     CUSTOM_VISION_URL = os.getenv('CUSTOM_VISION_URL')
     CUSTOM_VISION_KEY = os.getenv('CUSTOM_VISION_KEY')
     CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', 0.1))
+    CUSTOM_VISION_TIMEOUT = float(os.getenv('CUSTOM_VISION_TIMEOUT', 15))
+    
+    # Threads per gunicorn worker; the vision limit and queue are sized from it
+    # so that a full queue is reachable and sheds before gunicorn's backlog
+    WORKER_THREADS = int(os.getenv('WORKER_THREADS', 8))
+    VISION_MAX_CONCURRENCY = int(os.getenv('VISION_MAX_CONCURRENCY', max(1, WORKER_THREADS * 5 // 8)))
+    VISION_MAX_QUEUE = int(os.getenv('VISION_MAX_QUEUE', WORKER_THREADS // 4))
+    VISION_INITIAL_CONCURRENCY = int(os.getenv('VISION_INITIAL_CONCURRENCY', min(4, VISION_MAX_CONCURRENCY)))
+    VISION_MIN_CONCURRENCY = int(os.getenv('VISION_MIN_CONCURRENCY', 1))
+    VISION_LATENCY_TARGET = float(os.getenv('VISION_LATENCY_TARGET', 2.0))
+    VISION_QUEUE_TIMEOUT = float(os.getenv('VISION_QUEUE_TIMEOUT', 2.0))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30))
     
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 5242880))
     ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'jpg,jpeg,png,webp').split(','))
     
+    LABELS_PATH = os.getenv('LABELS_PATH', '../custom_vision/app/labels.txt')
+    
     @classmethod
     def validate_config(cls):
         required_vars = ['CUSTOM_VISION_URL', 'CUSTOM_VISION_KEY']
@@ -23,6 +38,15 @@ class Config:
         if missing_vars:
             raise ValueError(f"Missing environment variables: {', '.join(missing_vars)}")
 
+        if not (1 <= cls.VISION_MIN_CONCURRENCY <= cls.VISION_INITIAL_CONCURRENCY <= cls.VISION_MAX_CONCURRENCY):
+            raise ValueError("Vision concurrency must satisfy 1 <= MIN <= INITIAL <= MAX")
+        
+        if cls.VISION_MAX_CONCURRENCY + cls.VISION_MAX_QUEUE >= cls.WORKER_THREADS:
+            raise ValueError(
+                f"VISION_MAX_CONCURRENCY + VISION_MAX_QUEUE must be below WORKER_THREADS ({cls.WORKER_THREADS}) "
+                "so overload is shed instead of queueing in gunicorn"
+            )
+
         return True
 
 INGREDIENTS_TEMPLATE = {
@@ -37,3 +61,14 @@ INGREDIENTS_TEMPLATE = {
     "scallop": 0, "shrimp": 0, "spinach": 0, "sweet potato": 0, "tomato": 0,
     "watermelon": 0, "zucchini": 0
 }
+
+
+LABEL_SYNONYMS = {
+    "aubergine": "eggplant", "bell pepper": "capsicum", "sweet pepper": "capsicum",
+    "beet": "beetroot", "bok choy": "bokchoy", "pak choi": "bokchoy",
+    "chickpea": "chickpeas", "garbanzo": "chickpeas", "chilli": "chili pepper",
+    "chilli pepper": "chili pepper", "chile": "chili pepper", "courgette": "zucchini",
+    "maize": "corn", "pea": "peas", "prawn": "shrimp", "sweetpotato": "sweet potato",
+    "spaghetti": "pasta", "noodles": "pasta", "rockmelon": "cantaloupe",
+    "extra virgin olive oil": "olive oil", "vegetable oil": "oil", "cooking oil": "oil"
+}
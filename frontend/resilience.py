@@ -0,0 +1,144 @@
+import threading
+import time
+from typing import Optional
+
+
+class ServiceUnavailable(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# AIMD limit on in-flight calls: grow by 1/limit on fast successes, shrink
+# multiplicatively on slow or failed calls
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int,
+                 latency_target: float, max_queue: int, queue_timeout: float,
+                 backoff_ratio: float = 0.9):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backoff_ratio = backoff_ratio
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> bool:
+        with self._cond:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            if self._waiting >= self.max_queue:
+                return False
+
+            self._waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self._in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self._in_flight += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    def cancel(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def release(self, latency: float, success: bool):
+        with self._cond:
+            self._in_flight -= 1
+            if success and latency <= self.latency_target:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            else:
+                self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+            self._cond.notify()
+
+
+# Every admitted call carries the generation it was admitted under; results from
+# an older generation (e.g. slow calls that started before the breaker opened)
+# are ignored so they cannot close or re-arm the breaker.
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._generation = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> int:
+        with self._lock:
+            if self._opened_at is None:
+                return 1
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            return max(1, int(remaining + 0.999))
+
+    def allow_request(self) -> Optional[int]:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return self._generation
+            if self._state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout:
+                return None
+            # Let a single probe through once the reset timeout has elapsed
+            if self._probe_in_flight:
+                return None
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+            self._generation += 1
+            return self._generation
+
+    def record_success(self, generation: int):
+        with self._lock:
+            if generation != self._generation or self._state == self.OPEN:
+                return
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, generation: int):
+        with self._lock:
+            if generation != self._generation or self._state == self.OPEN:
+                return
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._generation += 1
+
+    def record_inconclusive(self, generation: int):
+        # The call said nothing about backend health; free the probe slot so
+        # the next request can retry it
+        with self._lock:
+            if generation == self._generation and self._state == self.HALF_OPEN:
+                self._probe_in_flight = False